@@ -2,6 +2,31 @@ import networkx as nx
 import numpy as np
 import typing as th
 import pandas as pd
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _topological_sort(nodes: th.Iterable, parents: th.Dict[th.Any, th.List], children: th.Dict[th.Any, th.Iterable]):
+    """
+    Kahn's algorithm on the parents/children lists of a DAG.
+
+    Nodes are visited in FIFO order, which results in the same ordering as networkx's topological_sort
+    (nodes are listed generation by generation, and children are visited in their adjacency order).
+    """
+    indegree = {v: len(parents[v]) for v in nodes}
+    queue = deque(v for v, d in indegree.items() if d == 0)
+    order = []
+    while queue:
+        u = queue.popleft()
+        order.append(u)
+        for v in children[u]:
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                queue.append(v)
+    if len(order) != len(indegree):
+        raise ValueError("The graph contains a cycle, no topological ordering exists.")
+    return order
 
 
 class SCM:
@@ -22,6 +47,8 @@ class SCM:
         # The actual data generating functions
         get_exogenous_noise: th.Optional[th.Callable] = None,
         get_covariate_from_parents: th.Optional[th.Callable] = None,
+        # (optional) a function that generates the noise of all the nodes at once
+        get_exogenous_noise_batch: th.Optional[th.Callable] = None,
         # The function that generates the formula for each node (for mere visualization purposes)
         get_covariate_from_parents_signature: th.Optional[th.Callable] = None,
     ):
@@ -35,6 +62,10 @@ class SCM:
 
             get_exogenous_noise: a function that takes a seed and returns a noise
             get_covariate_from_parents: a function that takes a list of inputs and a list of parameters and returns a covariate
+            get_exogenous_noise_batch: (optional) a function that takes the noise parameters of all the nodes, a seed, the
+                                        number of samples, and the list of nodes, and returns an (n_samples, n_nodes)
+                                        array of noises (columns following the given nodes). If provided, it is
+                                        used instead of calling get_exogenous_noise once per node.
             get_covariate_from_parents_signature: a function that takes a list of inputs and a list of parameters and returns a
                                         string representation of the covariate
             For more information on how to implement these functions, check out the function documentation in
@@ -46,13 +77,51 @@ class SCM:
         self.parent_parameters = parent_parameters
         self.parents = parents
 
-        self.topological_order = list(nx.topological_sort(dag))
+        if all(v in parents for v in dag.nodes):
+            self.topological_order = _topological_sort(dag.nodes, parents, dag.succ)
+        else:
+            self.topological_order = list(nx.topological_sort(dag))
+        # map every node to its column in the simulation buffer (columns follow the order of dag.nodes)
+        self._col = {v: i for i, v in enumerate(self.dag.nodes)}
+        # precompute everything that simulate needs per node (following the topological order)
+        # so that its loop only does integer indexing
+        self._topo_cols = [self._col[v] for v in self.topological_order]
+        self._parent_cols = [tuple(self._col[u] for u in self.parents[v]) for v in self.topological_order]
+        # every parent has to be simulated before its children (checked once here instead of in simulate)
+        position = {v: ct for ct, v in enumerate(self.topological_order)}
+        for ct, v in enumerate(self.topological_order):
+            for u in self.parents[v]:
+                if position[u] > ct:
+                    raise Exception(f"Parent {u} of node {v} has not been assigned a value yet")
+        self._noise_params_list = [self.noise_parameters[v] for v in self.topological_order]
+        self._node_params_list = [self.node_parameters[v] for v in self.topological_order]
+        self._parent_params_list = [self.parent_parameters[v] for v in self.topological_order]
+        # group the (topological) positions of the nodes into levels by their longest path from a root,
+        # nodes within the same level do not depend on each other and can be simulated concurrently
+        depth = {}
+        self._levels = []
+        for ct, v in enumerate(self.topological_order):
+            depth[v] = 1 + max((depth[u] for u in self.parents[v]), default=-1)
+            if depth[v] == len(self._levels):
+                self._levels.append([])
+            self._levels[depth[v]].append(ct)
+        # the edges of the dag as two arrays of (source, target) columns
+        self._edges_u = np.fromiter((self._col[u] for u, _ in self.dag.edges), dtype=np.int32)
+        self._edges_v = np.fromiter((self._col[v] for _, v in self.dag.edges), dtype=np.int32)
+        # an array lookup from node labels to columns, when the nodes are labeled with non-negative integers
+        self._col_lookup = None
+        if all(isinstance(v, (int, np.integer)) and v >= 0 for v in self.dag.nodes):
+            self._col_lookup = np.zeros(max(self.dag.nodes, default=-1) + 1, dtype=np.int64)
+            self._col_lookup[list(self._col)] = list(self._col.values())
+        # torch copies of the edge arrays (and the column lookup) per device, see count_backward_torch
+        self._edge_tensors = {}
 
         self.get_exogenous_noise = get_exogenous_noise
         self.get_covariate_from_parents = get_covariate_from_parents
+        self.get_exogenous_noise_batch = get_exogenous_noise_batch
         self.get_covariate_from_parents_signature = get_covariate_from_parents_signature
-
-        self.fill_out_labels()
+        # the functions used for each column of observational simulations (shared by the calls without interventions)
+        self._observational_funcs = [self.get_covariate_from_parents] * self.n
 
     def simulate(
         self,
@@ -60,6 +129,8 @@ class SCM:
         seed: th.Optional[int] = None,
         intervention_nodes: th.Optional[th.List[th.Any]] = None,
         intervention_functions: th.Optional[th.List[th.Callable]] = None,
+        n_jobs: int = 1,
+        prepared_interventions: th.Optional[th.List[th.Callable]] = None,
     ) -> pd.DataFrame:
         """
         This function returns a dataframe containing a number of simulations ran on the data.
@@ -87,27 +158,56 @@ class SCM:
             seed (int, optional): _description_. Defaults to None.
             intervention_node (th.Optional[th.Any], optional): _description_. Defaults to None.
             intervention_function (th.Optional[th.Callable], optional): _description_. Defaults to None.
+            n_jobs (int, optional): The number of threads used to simulate the nodes of the same topological level
+                concurrently. The noises are all drawn beforehand in that case, so the covariate functions
+                should not rely on the global random state for the results to be reproducible. Defaults to 1.
+            prepared_interventions (th.Optional[th.List[th.Callable]], optional): The output of
+                `prepare_interventions`, to avoid processing the same interventions on every call. If provided,
+                intervention_nodes and intervention_functions are ignored. Defaults to None.
 
         Returns:
             pandas.DataFrame: A dataframe containing the simulated data
         """
-        # Create a dictionary from the intervention nodes to their corresponding intervention functions
-        if intervention_nodes is None:
-            intervention_nodes = []
-            intervention_functions = []
-        intervention_node_to_function = dict(list(zip(intervention_nodes, intervention_functions)))
+        # The function used to compute each column (intervention functions or the default covariate function)
+        if prepared_interventions is not None:
+            funcs = prepared_interventions
+        elif not intervention_nodes:
+            funcs = self._observational_funcs
+        else:
+            funcs = self.prepare_interventions(intervention_nodes, intervention_functions)
 
-        # All the values per columns
-        vals = {x: None for x in self.dag.nodes}
+        # All the values per columns, stored in a single (n_samples, n_nodes) buffer indexed by self._col
+        # the buffer is column-major, so that each node writes (and its children read) a contiguous column,
+        # and the resulting dataframe holds all the columns in a single contiguous block without copies
+        vals = np.empty((n_samples, self.n), dtype=np.float64, order="F")
 
         # seed equals a random number if seed is None
         seed = np.random.randint(0, 100000) if seed is None else seed
 
-        for ct, v in enumerate(self.topological_order):
-            noises = self.get_exogenous_noise(
-                self.noise_parameters[v],
-                seed=seed + ct,
+        # draw the noises of all the nodes at once if possible
+        all_noises = None
+        if self.get_exogenous_noise_batch is not None:
+            all_noises = self.get_exogenous_noise_batch(
+                self.noise_parameters,
+                seed=seed,
                 n_samples=n_samples,
+                nodes=self.topological_order,
+            )
+            if all_noises.shape != (n_samples, self.n):
+                raise Exception(
+                    f"The batched noise function must generate an array of shape {(n_samples, self.n)}, "
+                    f"but got {all_noises.shape} instead."
+                )
+
+        def get_noises(ct):
+            noises = (
+                all_noises[:, ct]
+                if all_noises is not None
+                else self.get_exogenous_noise(
+                    self._noise_params_list[ct],
+                    seed=seed + ct,
+                    n_samples=n_samples,
+                )
             )
 
             # Since this function is custom, raise exception if it does not
@@ -118,22 +218,50 @@ class SCM:
                     "Try rewriting your get_exogenous_noise function to incorporate the n_samples argument."
                 )
                 raise Exception(exception_str)
+            return noises
 
-            func = (
-                intervention_node_to_function[v]
-                if v in intervention_node_to_function
-                else self.get_covariate_from_parents
-            )
-            parent_values = []
-            for u in self.parents[v]:
-                if vals[u] is None:
-                    raise Exception(f"Parent {u} of node {v} has not been assigned a value yet")
-                parent_values.append(vals[u])
-            vals[v] = func(noises, parent_values, self.parent_parameters[v], self.node_parameters[v])
+        def assign(ct, noises):
+            col, parent_cols = self._topo_cols[ct], self._parent_cols[ct]
+            func = funcs[col]
+            # parent values are passed as column views of the buffer (no copies), the parents are guaranteed
+            # to be assigned already by the topological order (see __init__)
+            parent_values = [vals[:, i] for i in parent_cols]
+            vals[:, col] = func(noises, parent_values, self._parent_params_list[ct], self._node_params_list[ct])
 
-        samples = pd.DataFrame(vals)
+        if n_jobs == 1:
+            for ct in range(self.n):
+                assign(ct, get_noises(ct))
+        else:
+            # every node writes to its own column of the buffer, so the nodes of a level can be assigned concurrently
+            noises = [get_noises(ct) for ct in range(self.n)]
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                for level in self._levels:
+                    # consume the results to propagate any exception raised in the workers
+                    list(executor.map(lambda ct: assign(ct, noises[ct]), level))
+
+        samples = pd.DataFrame(vals, columns=list(self.dag.nodes), copy=False)
         return samples
 
+    def prepare_interventions(
+        self,
+        intervention_nodes: th.Optional[th.List[th.Any]] = None,
+        intervention_functions: th.Optional[th.List[th.Callable]] = None,
+    ) -> th.List[th.Callable]:
+        """
+        Resolve the function used to compute each column of the simulation (the intervention function of the
+        node if it is intervened on, and get_covariate_from_parents otherwise).
+
+        The result can be passed to `simulate` as prepared_interventions, when simulating the same
+        interventions multiple times.
+
+        Returns:
+            A list of callables indexed by the columns of the simulation (following the order of dag.nodes)
+        """
+        funcs = [self.get_covariate_from_parents] * self.n
+        for node, func in zip(intervention_nodes or [], intervention_functions or []):
+            funcs[self._col[node]] = func
+        return funcs
+
     @property
     def n(self):
         return self.dag.number_of_nodes()
@@ -141,15 +269,26 @@ class SCM:
     def nodes(self):
         return self.dag.nodes
 
-    def fill_out_labels(self):
-        self.node_labels = {}
+    @functools.cached_property
+    def node_labels(self) -> th.Dict[th.Any, str]:
+        """
+        The string representation of every node (computed on first access, since it is only needed for
+        get_description and draw).
+        """
+        node_labels = {}
         for v in self.topological_order:
             if self.get_covariate_from_parents_signature is not None:
-                self.node_labels[v] = self.get_covariate_from_parents_signature(
+                node_labels[v] = self.get_covariate_from_parents_signature(
                     v, self.parents[v], self.node_parameters[v], self.noise_parameters[v], self.parent_parameters[v]
                 )
             else:
-                self.node_labels[v] = f"x{(v)}"
+                node_labels[v] = f"x{(v)}"
+        return node_labels
+
+    def fill_out_labels(self):
+        # (re)compute the node labels
+        self.__dict__.pop("node_labels", None)
+        return self.node_labels
 
     def get_description(self) -> str:
         ret = ""
@@ -181,16 +320,63 @@ class SCM:
         """
         If we apply ordering to the graph of self.dag, how many edges will be reversed?
         """
-        # get the index of each node in ordering
-        ordering = {v: i for i, v in enumerate(ordering)}
+        # get the index of each node (column) in ordering
+        rank = np.empty(self.n, dtype=np.int32)
+        rank[[self._col[v] for v in ordering]] = np.arange(self.n, dtype=np.int32)
         # count the number of edges that will be reversed
-        count = 0
-        for u, v in self.dag.edges:
-            if ordering[u] > ordering[v]:
-                count += 1
-        return count
+        return int(np.count_nonzero(rank[self._edges_u] > rank[self._edges_v]))
+
+    def count_backward_batch(self, orderings: th.Union[np.ndarray, th.List[th.List[int]]]) -> np.ndarray:
+        """
+        Vectorized version of count_backward for a batch of orderings.
+
+        Args:
+            orderings: an (M, n) array (or list) of orderings of the nodes of self.dag
+
+        Returns:
+            An (M,) array containing the number of edges that each ordering reverses.
+        """
+        orderings = np.asarray(orderings)
+        # map the node labels to their columns
+        if self._col_lookup is not None:
+            cols = self._col_lookup[orderings]
+        else:
+            cols = np.vectorize(self._col.__getitem__, otypes=[np.int64])(orderings)
+        # rank[k, col] is the position of the node of column col in the k-th ordering
+        ranks = np.empty(cols.shape, dtype=np.int32)
+        np.put_along_axis(ranks, cols, np.broadcast_to(np.arange(self.n, dtype=np.int32), cols.shape), axis=1)
+        return np.count_nonzero(ranks[:, self._edges_u] > ranks[:, self._edges_v], axis=1)
+
+    def count_backward_torch(self, orderings):
+        """
+        Same as count_backward_batch, for an (M, n) LongTensor of orderings (e.g. on the GPU), the computation
+        is done on the device of the orderings.
+
+        Returns:
+            An (M,) LongTensor containing the number of edges that each ordering reverses.
+        """
+        import torch
+
+        device = orderings.device
+        if device not in self._edge_tensors:
+            self._edge_tensors[device] = (
+                torch.as_tensor(self._edges_u, dtype=torch.long, device=device),
+                torch.as_tensor(self._edges_v, dtype=torch.long, device=device),
+                torch.as_tensor(self._col_lookup, device=device) if self._col_lookup is not None else None,
+            )
+        edges_u, edges_v, col_lookup = self._edge_tensors[device]
+        if col_lookup is not None:
+            cols = col_lookup[orderings.long()]
+        else:
+            # node labels that are not integers can not be in a tensor, so they are expected to be columns already
+            cols = orderings.long()
+        # rank[k, col] is the position of the node of column col in the k-th ordering
+        ranks = torch.empty_like(cols)
+        ranks.scatter_(1, cols, torch.arange(self.n, device=device).expand_as(cols))
+        return (ranks[:, edges_u] > ranks[:, edges_v]).sum(-1)
 
     @property
     def ordering(self):
-        # return the topological ordering of self.dag
-        return list(nx.topological_sort(self.dag))
+        # return the topological ordering of self.dag (computed once at construction,
+        # the dag is not expected to change afterwards)
+        return list(self.topological_order)
@@ -29,6 +29,8 @@ class SCMGenerator(ABC, BaseGenerator):
         graph_generator_args: th.Optional[th.Dict[str, th.Any]] = None,
         # seed
         seed=None,
+        # noise generation
+        batch_noise: bool = False,
     ):
         """
         The SCM generator has two parts, the first one generates a Graph which is given via the graph_generator
@@ -62,6 +64,11 @@ class SCMGenerator(ABC, BaseGenerator):
         Last but not least, for the sake of convenience, we also have the following function that can be used to
         print out the whole SCM. The function "get_covariate_from_parents_signature" is used to print out a formula
         that related the parents to the covariate. This is also an abstract function that should be implemented.
+
+        Optionally, a generator can also implement "get_exogenous_noise_batch" which returns the noise values of all
+        the nodes at once (using a single random number generator). If batch_noise is set to True, the generated SCMs
+        use this function instead of calling "get_exogenous_noise" once per node. Note that the two schemes draw
+        different random streams, so the same seed does not produce the same samples under both.
         """
         BaseGenerator.__init__(self, seed=seed)
         self.graph_generator = (
@@ -70,6 +77,11 @@ class SCMGenerator(ABC, BaseGenerator):
             else dypy.eval(graph_generator)(**graph_generator_args)
         )
         self.sample_count = 0
+        self.batch_noise = batch_noise
+
+    # generators that support batched noise generation override this with a method
+    # that has the following signature: (noise_parameters, seed, n_samples, nodes) -> np.array
+    get_exogenous_noise_batch: th.Optional[th.Callable] = None
 
     @abstractmethod
     def generate_edge_functional_parameters(self, dag: nx.DiGraph, child: int, par: int, seed: int):
@@ -251,5 +263,6 @@ class SCMGenerator(ABC, BaseGenerator):
             parents,
             get_exogenous_noise=self.get_exogenous_noise,
             get_covariate_from_parents=self.get_covariate_from_parents,
+            get_exogenous_noise_batch=self.get_exogenous_noise_batch if self.batch_noise else None,
             get_covariate_from_parents_signature=self.get_covariate_from_parents_signature,
         )
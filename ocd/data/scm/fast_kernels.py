@@ -0,0 +1,53 @@
+"""
+This file contains compiled kernels for simulating parametric SCMs.
+
+The kernels are jit-compiled with numba if it is installed, otherwise equivalent
+(vectorized) numpy implementations are used.
+"""
+
+import numpy as np
+
+try:
+    import numba
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def _gaussian_noise(loc: float, scale: float, n_samples: int, seed: int) -> np.ndarray:
+    """
+    Draw n_samples from a normal distribution with the given loc and scale.
+
+    (when jitted, numba's own random generator is used, which is seeded independently of numpy's global state)
+    """
+    np.random.seed(seed)
+    return np.random.normal(loc, scale, n_samples)
+
+
+def _linear_combination(parents: np.ndarray, weights: np.ndarray, bias: float) -> np.ndarray:
+    """
+    Compute parents @ weights + bias for a (n_samples, n_parents) array of parent values.
+    """
+    n_samples, n_parents = parents.shape
+    outputs = np.empty(n_samples)
+    for i in numba.prange(n_samples):
+        acc = bias
+        for j in range(n_parents):
+            acc += parents[i, j] * weights[j]
+        outputs[i] = acc
+    return outputs
+
+
+if NUMBA_AVAILABLE:
+    gaussian_noise = numba.njit(cache=True)(_gaussian_noise)
+    linear_combination = numba.njit(cache=True, parallel=True)(_linear_combination)
+else:
+    gaussian_noise = _gaussian_noise
+
+    def linear_combination(parents: np.ndarray, weights: np.ndarray, bias: float) -> np.ndarray:
+        """
+        Compute parents @ weights + bias for a (n_samples, n_parents) array of parent values.
+        """
+        return parents @ weights + bias
@@ -4,6 +4,7 @@ that can generte datasets with parametric assumptions.
 """
 
 from ocd.data.scm import SCMGenerator, GraphGenerator
+from ocd.data.scm.fast_kernels import gaussian_noise, linear_combination
 import typing as th
 import networkx as nx
 import numpy
@@ -54,6 +55,8 @@ class ParametricSCMGenerator(SCMGenerator):
         t_function: th.Optional[th.Union[th.Callable, str, th.Dict[str, str]]] = None,
         s_function_signature: th.Optional[str] = None,
         t_function_signature: th.Optional[str] = None,
+        batch_noise: bool = False,
+        use_fast_kernels: bool = False,
     ):
         """
         Create a premade SCM generator for simulated data.
@@ -65,8 +68,11 @@ class ParametricSCMGenerator(SCMGenerator):
             mean (th.Tuple[float, float], optional): The range of the noise mean -- Defaults to (-1, 1.0).
             weight_t (th.Tuple[float, float], optional): The range of the parameters in s -- Defaults to (-1.0, 1.0).
             weight_s (th.Tuple[float, float], optional): The range of the parameters in t -- Defaults to (-1.0, 1.0).
+            batch_noise (bool, optional): Whether to draw the noises of all the nodes at once -- Defaults to False.
+            use_fast_kernels (bool, optional): Whether to use the (numba) kernels of ocd.data.scm.fast_kernels for
+                the linear combinations of the parents, and for the noises if noise_type is "normal" -- Defaults to False.
         """
-        super().__init__(graph_generator, graph_generator_args, seed)
+        super().__init__(graph_generator, graph_generator_args, seed, batch_noise=batch_noise)
         
         # Handle the weights
         if isinstance(weight_t, float) or isinstance(weight_t, int):
@@ -82,6 +88,7 @@ class ParametricSCMGenerator(SCMGenerator):
                 noise_parameters[key] = (item, item)
         self.noise_type = noise_type
         self.noise_parameters = noise_parameters          
+        self.use_fast_kernels = use_fast_kernels
 
         # Add useful contexts
         dy.register_context(numpy)
@@ -142,9 +149,21 @@ class ParametricSCMGenerator(SCMGenerator):
     def get_exogenous_noise(
         self, noise_parameters: th.Dict[str, th.Any], seed: int, n_samples: int = 1
     ) -> numpy.array:
+        if self.use_fast_kernels and self.noise_type == "normal":
+            return gaussian_noise(
+                float(noise_parameters.get("loc", 0.0)), float(noise_parameters.get("scale", 1.0)), n_samples, seed
+            )
         numpy.random.seed(seed)
         return getattr(numpy.random, self.noise_type)(**noise_parameters, size=n_samples)
 
+    def get_exogenous_noise_batch(
+        self, noise_parameters: th.Dict[th.Any, th.Dict[str, th.Any]], seed: int, n_samples: int, nodes: th.List
+    ) -> numpy.array:
+        rng = numpy.random.default_rng(seed)
+        # stack the parameters of every node into a vector so that they broadcast over the columns
+        params = {key: numpy.array([noise_parameters[v][key] for v in nodes]) for key in self.noise_parameters}
+        return getattr(rng, self.noise_type)(**params, size=(n_samples, len(nodes)))
+
     def get_covariate_from_parents(
         self,
         noise: np.array,
@@ -152,6 +171,8 @@ class ParametricSCMGenerator(SCMGenerator):
         parent_parameters: th.List[th.Dict[str, th.Any]],
         node_parameters: th.List[th.Dict[str, th.Any]],
     ) -> numpy.array:
+        if self.use_fast_kernels:
+            return self._get_covariate_from_parents_fast(noise, parents, parent_parameters, node_parameters)
         t_input = sum([p * pp["weight_t"] for p, pp in zip(parents, parent_parameters)]) + node_parameters["weight_t"]
 
         if isinstance(t_input, float):
@@ -165,6 +186,20 @@ class ParametricSCMGenerator(SCMGenerator):
         s = self.s_function(s_input)
         return t + s * noise
 
+    def _get_covariate_from_parents_fast(
+        self,
+        noise: np.array,
+        parents: th.List[float],
+        parent_parameters: th.List[th.Dict[str, th.Any]],
+        node_parameters: th.List[th.Dict[str, th.Any]],
+    ) -> numpy.array:
+        parents_arr = np.stack(parents, axis=1) if len(parents) else np.empty((len(noise), 0))
+        weights_t = np.array([pp["weight_t"] for pp in parent_parameters], dtype=np.float64)
+        weights_s = np.array([pp["weight_s"] for pp in parent_parameters], dtype=np.float64)
+        t = self.t_function(linear_combination(parents_arr, weights_t, float(node_parameters["weight_t"])))
+        s = self.s_function(linear_combination(parents_arr, weights_s, float(node_parameters["weight_s"])))
+        return t + s * noise
+
     def get_covariate_from_parents_signature(
         self,
         node: int,
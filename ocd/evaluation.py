@@ -101,6 +101,28 @@ def backward_relative_penalty(perm: th.List[int], dag: th.Union[np.array, nx.DiG
     return 1.0 * backwards / all
 
 
+def backward_relative_penalty_batch(perms: np.array, dag: th.Union[np.array, nx.DiGraph]) -> np.array:
+    """
+    Args:
+        perms (np.array): a (num_perms, n) array of permutations of the nodes
+        dag (np.array): adjacency matrix of the DAG
+
+    Vectorized version of backward_relative_penalty, computes the ratio of backward edges to all edges
+    for each of the permutations at once
+    """
+    perms = np.asarray(perms)
+    if isinstance(dag, np.ndarray):
+        sources, targets = np.nonzero(dag)
+    else:
+        edges = np.array(list(dag.edges), dtype=np.int64).reshape(-1, 2)
+        sources, targets = edges[:, 0], edges[:, 1]
+    # positions[k, v] is the index of node v in the k-th permutation
+    positions = np.empty_like(perms)
+    np.put_along_axis(positions, perms, np.arange(perms.shape[-1]), axis=-1)
+    backwards = (positions[:, sources] > positions[:, targets]).sum(axis=-1)
+    return 1.0 * backwards / len(sources)
+
+
 def shd(dag1: nx.DiGraph, dag2: nx.DiGraph, with_change_orientation=False):
     """
     Compute the structural hamming distance (SHD) between two DAGs
@@ -34,6 +34,9 @@ class AffineFlow(torch.nn.ModuleList):
         # general args
         device: th.Optional[torch.device] = None,
         dtype: th.Optional[torch.dtype] = None,
+        compiled: bool = False,
+        autocast_dtype: th.Optional[th.Union[str, torch.dtype]] = None,
+        log_scale_clamp: th.Optional[float] = 15.0,
     ):
         super().__init__()
         self.base_distribution = dy.get_value(base_distribution)(**(base_distribution_args or dict()))
@@ -58,6 +61,9 @@ class AffineFlow(torch.nn.ModuleList):
                     reversed_ordering=reversed_ordering,
                     device=device,
                     dtype=dtype,
+                    compiled=compiled,
+                    autocast_dtype=autocast_dtype,
+                    log_scale_clamp=log_scale_clamp,
                 )
             )
         if ordering is not None:
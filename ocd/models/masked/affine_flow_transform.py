@@ -82,10 +82,21 @@ class MaskedAffineFlowTransform(torch.nn.Module):
         # general args
         device: th.Optional[torch.device] = None,
         dtype: th.Optional[torch.dtype] = None,
+        compiled: bool = False,
+        autocast_dtype: th.Optional[th.Union[str, torch.dtype]] = None,
+        log_scale_clamp: th.Optional[float] = 15.0,
     ):
         super().__init__()
         self.additive: bool = additive
         self.share_parameters: bool = share_parameters
+        # s is clamped to [-log_scale_clamp, log_scale_clamp] so that exp(s) never overflows to inf (or underflows
+        # to 0), the same clamped s is used for the transform and the logabsdet (None to disable)
+        self.log_scale_clamp: th.Optional[float] = log_scale_clamp
+        # optionally run the masked mlps in lower precision (e.g. torch.bfloat16) using autocast, the scale and
+        # shift parameters are cast back to the dtype of the inputs before computing the transform and logabsdet
+        self.autocast_dtype: th.Optional[torch.dtype] = (
+            dy.get_value(autocast_dtype) if isinstance(autocast_dtype, str) else autocast_dtype
+        )
 
         args = dict(
             in_features=in_features,
@@ -100,14 +111,19 @@ class MaskedAffineFlowTransform(torch.nn.Module):
             reversed_ordering=reversed_ordering,
             device=device,
             dtype=dtype,
+            compiled=compiled,
         )
 
         if not share_parameters:
             self.masked_mlp_shift = MaskedMLP(**args, out_features=in_features)
             self.masked_mlp_scale = MaskedMLP(**args, out_features=in_features) if not additive else None
         else:
+            # additive transforms only have a shift parameter per dimension (there is nothing to share)
             self.masked_mlp = MaskedMLP(
-                **args, out_features=in_features * 2 if isinstance(in_features, int) else [f * 2 for f in in_features]
+                **args,
+                out_features=in_features
+                if additive
+                else (in_features * 2 if isinstance(in_features, int) else [f * 2 for f in in_features]),
             )
 
         self.scale_transform_s = None
@@ -127,23 +143,56 @@ class MaskedAffineFlowTransform(torch.nn.Module):
     ) -> None:
         if not self.share_parameters:
             self.masked_mlp_shift.reorder(ordering, seed, mask_index, initialization)
-            self.masked_mlp_scale.reorder(ordering, seed, mask_index, initialization)
+            if self.masked_mlp_scale is not None:
+                self.masked_mlp_scale.reorder(ordering, seed, mask_index, initialization)
         else:
             self.masked_mlp.reorder(ordering, seed, mask_index, initialization)
 
-    def get_scale_and_shift(self, inputs: torch.Tensor, **kwargs) -> th.Tuple[torch.Tensor, torch.Tensor]:
-        if self.share_parameters:
-            params: th.Tuple[torch.Tensor, torch.Tensor] = self.masked_mlp(inputs, **kwargs)
-            s, t = (torch.zeros_like(params), params) if self.additive else (params[..., 0::2], params[..., 1::2])
+    @staticmethod
+    def _split_scale_and_shift(params: torch.Tensor) -> th.Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Split the outputs of a shared masked mlp into the scale and shift parameters.
+
+        Masked linear layers put the outputs of each input dimension in one block, so the outputs are interleaved
+        as [s_0, t_0, s_1, t_1, ...]. Instead of using two strided views, they are de-interleaved with a single
+        copy, so that s and t are both contiguous.
+        """
+        s, t = params.unflatten(-1, (-1, 2)).movedim(-1, 0).contiguous().unbind(0)
+        return s, t
+
+    def get_scale_and_shift(
+        self, inputs: torch.Tensor, **kwargs
+    ) -> th.Tuple[th.Optional[torch.Tensor], torch.Tensor]:
+        """
+        Compute the scale (s) and shift (t) parameters of the transform. In additive mode, s is None (i.e. s = 0).
+        """
+        if self.autocast_dtype is not None:
+            with torch.autocast(device_type=inputs.device.type, dtype=self.autocast_dtype):
+                s, t = self._get_scale_and_shift(inputs, **kwargs)
+            s, t = s.to(inputs.dtype) if s is not None else None, t.to(inputs.dtype)
         else:
-            s: torch.Tensor = self.masked_mlp_shift(inputs, **kwargs)
-            t: torch.Tensor = self.masked_mlp_scale(inputs, **kwargs) if not self.additive else torch.zeros_like(s)
-        if self.scale_transform_s is not None:
-            s = self.scale_transform_s(s) if not self.additive else s
+            s, t = self._get_scale_and_shift(inputs, **kwargs)
+        if self.scale_transform_s is not None and s is not None:
+            s = self.scale_transform_s(s)
+        if self.log_scale_clamp is not None and s is not None:
+            s = s.clamp(-self.log_scale_clamp, self.log_scale_clamp)
         if self.scale_transform_t is not None:
             t = self.scale_transform_t(t)
         return s, t
 
+    def _get_scale_and_shift(
+        self, inputs: torch.Tensor, **kwargs
+    ) -> th.Tuple[th.Optional[torch.Tensor], torch.Tensor]:
+        if self.additive:
+            return None, (self.masked_mlp if self.share_parameters else self.masked_mlp_shift)(inputs, **kwargs)
+        if self.share_parameters:
+            params: torch.Tensor = self.masked_mlp(inputs, **kwargs)
+            s, t = self._split_scale_and_shift(params)
+        else:
+            s: torch.Tensor = self.masked_mlp_shift(inputs, **kwargs)
+            t: torch.Tensor = self.masked_mlp_scale(inputs, **kwargs)
+        return s, t
+
     def forward(self, inputs: torch.Tensor, **kwargs) -> th.Tuple[torch.Tensor, torch.Tensor]:
         """
         $T^{-1}$ is the inverse of $T$. $T$ is a function from latent $z$ to data $x$ of the form:
@@ -157,7 +206,17 @@ class MaskedAffineFlowTransform(torch.nn.Module):
             inputs (torch.Tensor): x ~ p_x(x)
         """
         s, t = self.get_scale_and_shift(inputs, **kwargs)
-        outputs = (inputs - t) * torch.exp(-s)
+        if s is None:
+            # additive transform (s = 0), there is no scaling and the logabsdet is zero
+            return inputs - t, inputs.new_zeros(inputs.shape[:-1])
+        # exp(-s) is computed once into a fresh buffer (exp_ saves its result, so this is autograd-safe)
+        inv_scale = s.neg().exp_()
+        outputs = inputs - t
+        # the multiplication can only be done in-place when no graph is being recorded through it
+        if torch.is_grad_enabled() and (outputs.requires_grad or inv_scale.requires_grad):
+            outputs = outputs * inv_scale
+        else:
+            outputs.mul_(inv_scale)
         logabsdet = -torch.sum(s, dim=-1)
         return outputs, logabsdet
 
@@ -182,12 +241,31 @@ class MaskedAffineFlowTransform(torch.nn.Module):
         z: torch.Tensor = inputs.reshape(-1, inputs.shape[-1])
         # initialize the outputs to 0 (doesn't matter what we initialize it to)
         outputs: torch.Tensor = torch.zeros_like(z)
+        # when no graph is recorded (e.g. sampling), the new outputs and exp(s) are written into preallocated buffers
+        # (the outputs are double buffered, since the previous outputs are needed for the convergence check)
+        reuse_buffers = not torch.is_grad_enabled()
+        if reuse_buffers:
+            outputs_buf, exp_buf = torch.empty_like(z), torch.empty_like(z)
         # passing the outputs through the autoregressive network elementwise for d times (where d is the dimensionality
         # of the input features) will result in the inverse of the affine transformation
         for _ in range(inputs.shape[-1]):
             s, t = self.get_scale_and_shift(outputs, perm_mat=perm_mat, **kwargs)
-            outputs = torch.exp(s) * z + t
-            logabsdet = torch.sum(s, dim=-1)  # this is the inverse of the logabsdet
+            if reuse_buffers:
+                if s is not None:
+                    new_outputs = torch.addcmul(t, torch.exp(s, out=exp_buf), z, out=outputs_buf)
+                else:
+                    new_outputs = torch.add(z, t, out=outputs_buf)
+                outputs_buf = outputs  # the previous outputs are overwritten in the next iteration
+            else:
+                new_outputs = torch.exp(s) * z + t if s is not None else z + t
+            # the autoregressive fixed point is unique, once the outputs stop changing, the remaining
+            # iterations would reproduce the exact same values (and s) so we can stop early
+            converged = torch.equal(new_outputs, outputs)
+            outputs = new_outputs
+            if converged:
+                break
+        # this is the inverse of the logabsdet (zero for additive transforms)
+        logabsdet = torch.sum(s, dim=-1) if s is not None else z.new_zeros(z.shape[:-1])
 
         # unflatten the outputs and logabsdet to match the original batch shape
         return outputs.unflatten(0, inputs.shape[:-1]), logabsdet.unflatten(0, inputs.shape[:-1])
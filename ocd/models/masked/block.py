@@ -2,6 +2,7 @@ import typing as th
 import torch
 from .linear import MaskedLinear
 import dypy
+import inspect
 
 
 class MaskedBlock(MaskedLinear):
@@ -28,6 +29,7 @@ class MaskedBlock(MaskedLinear):
         device: th.Optional[torch.device] = None,
         dtype: th.Optional[torch.dtype] = None,
         mask_dtype: torch.dtype = torch.uint8,
+        compiled: bool = False,
     ):
         # init linear
         super().__init__(
@@ -41,24 +43,41 @@ class MaskedBlock(MaskedLinear):
             mask_dtype=mask_dtype,
         )
         self.residual = residual
-        self.dropout = torch.nn.Dropout(p=dropout) if dropout else None
-
         self.batch_norm = (
             torch.nn.BatchNorm1d(num_features=out_features, dtype=dtype, device=device, **(batch_norm_args or dict()))
             if batch_norm
             else None
         )
-        self.activation = dypy.eval(activation)(**(activation_args or dict())) if activation else None
+        # the outputs of the linear layer (and batch norm) are fresh tensors, so the activation can work inplace
+        # (if it supports it and the user did not specify otherwise)
+        activation_args = dict(activation_args or dict())
+        if activation:
+            activation = dypy.eval(activation)
+            if "inplace" not in activation_args and "inplace" in inspect.signature(activation).parameters:
+                activation_args["inplace"] = True
+        self.activation = activation(**activation_args) if activation else None
+        # activations (e.g. tanh, inplace leaky relu) save their outputs for backward, so dropout can only be
+        # inplace when there is no activation
+        self.dropout = torch.nn.Dropout(p=dropout, inplace=self.activation is None) if dropout else None
+        # the pointwise operations that follow the linear layer (missing stages are omitted)
+        self._pointwise_ops = [op for op in (self.batch_norm, self.activation, self.dropout) if op is not None]
+        # optionally fuse the pointwise tail of the block (batch_norm, activation, dropout) with torch.compile
+        self.compiled = compiled and hasattr(torch, "compile")
+        self._pointwise_fn = torch.compile(self._pointwise) if self.compiled else self._pointwise
         # todo: add more explicit control over residual
         # assert not residual or (
         #     self.in_blocks == self.out_blocks
         # ), "Residual connections are only possible if in_blocks == out_blocks"
 
+    def _pointwise(self, outputs: torch.Tensor) -> torch.Tensor:
+        for op in self._pointwise_ops:
+            outputs = op(outputs)
+        return outputs
+
     def forward(self, inputs: torch.Tensor, perm_mat: torch.Tensor) -> torch.Tensor:
         outputs = super().forward(inputs, perm_mat=perm_mat)
-        outputs = self.batch_norm(outputs) if self.batch_norm else outputs
-        outputs = self.activation(outputs) if self.activation else outputs
-        outputs = self.dropout(outputs) if self.dropout else outputs
+        outputs = self._pointwise_fn(outputs)
+        # the residual check is kept outside of the compiled region (to avoid recompilations)
         if self.residual and self.in_blocks == self.out_blocks:
             # only perform residual connection if in_blocks == out_blocks
             outputs = outputs + inputs
@@ -119,7 +119,13 @@ class MaskedLinear(torch.nn.Linear):
             # if grad contains at least one nan, return a tensor of zeros
             # this is for some rare cases where the gradient contains nans
             # and we don't want to spoil the whole training thus far
-            return torch.zeros_like(grad) if self.contains_nan or torch.isnan(grad).any() else grad
+            # (the check is done on the device, without synchronizing with the host)
+            zero_grad = torch.isnan(grad).any()
+            if isinstance(self.contains_nan, torch.Tensor):
+                zero_grad = zero_grad | self.contains_nan.to(grad.device)
+            elif self.contains_nan:
+                return torch.zeros_like(grad)
+            return torch.where(zero_grad, torch.zeros_like(grad), grad)
 
         for param in self.parameters():
             param.register_hook(hook_fn)
@@ -230,10 +236,8 @@ class MaskedLinear(torch.nn.Linear):
             output shape is (batch, out_features) if perm_mat is not None,
         """
         # if inputs contains a large value or nan set self.contains_nan to True
-        if torch.isnan(inputs).any() or torch.isinf(inputs).any() or torch.max(torch.abs(inputs)) > 1e3:
-            self.contains_nan = True
-        else:
-            self.contains_nan = False
+        # (kept as a boolean tensor on the device, reading it back on every forward would synchronize with the host)
+        self.contains_nan = torch.logical_not(torch.isfinite(inputs).all()) | (inputs.abs().amax() > 1e3)
 
         perm_mat = perm_mat.to(self.weight.device) if perm_mat is not None else None
         # inputs = inputs.to(self.weight.device)
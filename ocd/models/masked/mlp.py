@@ -27,9 +27,13 @@ class MaskedMLP(torch.nn.ModuleList):
         reversed_ordering: bool = False,
         device: th.Optional[torch.device] = None,
         dtype: th.Optional[torch.dtype] = None,
+        compiled: bool = False,
     ):
         """
         Initialize a Masked (autoregressive) Multi-Layer Perceptron.
+
+        If compiled is True (and torch.compile is available), the pointwise operations of every block are
+        fused using torch.compile.
         """
         super().__init__()
         # process arguments (put them in the right format)
@@ -67,6 +71,7 @@ class MaskedMLP(torch.nn.ModuleList):
                     residual=residual if i < len(layers) - 1 else False,
                     device=device,
                     dtype=dtype,
+                    compiled=compiled,
                 )
             )
 
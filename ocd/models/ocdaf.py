@@ -41,6 +41,9 @@ class OCDAF(torch.nn.Module):
         # general args
         device: th.Optional[torch.device] = None,
         dtype: th.Optional[torch.dtype] = None,
+        compiled: bool = False,  # fuse the pointwise operations of the masked blocks with torch.compile
+        autocast_dtype: th.Optional[th.Union[str, torch.dtype]] = None,  # e.g. torch.bfloat16 for the masked mlps
+        log_scale_clamp: th.Optional[float] = 15.0,  # bound on |s| of the affine transforms (None to disable)
     ) -> None:
         super().__init__()
         if in_features is None:
@@ -85,6 +88,9 @@ class OCDAF(torch.nn.Module):
             reversed_ordering=reversed_ordering,
             device=device,
             dtype=dtype,
+            compiled=compiled,
+            autocast_dtype=autocast_dtype,
+            log_scale_clamp=log_scale_clamp,
         )
 
         if use_permutation:
@@ -153,19 +159,28 @@ class OCDAF(torch.nn.Module):
             scores = permutation_results["scores"]
 
             # Calculate all the log prob values
-            inputs_repeated = torch.repeat_interleave(inputs, repeats=hard_perm_mat.shape[0], dim=0)
-            hard_perm_mat_repeated = hard_perm_mat.repeat(inputs.shape[0], 1, 1)
+            # (the pairs are built from broadcasted views, so each tensor is only materialized once)
+            num_inputs, num_perms = inputs.shape[0], hard_perm_mat.shape[0]
+            inputs_repeated = inputs.unsqueeze(1).expand(num_inputs, num_perms, *inputs.shape[1:])
+            inputs_repeated = inputs_repeated.reshape(num_inputs * num_perms, *inputs.shape[1:])
+            hard_perm_mat_repeated = hard_perm_mat.unsqueeze(0).expand(num_inputs, *hard_perm_mat.shape)
+            hard_perm_mat_repeated = hard_perm_mat_repeated.reshape(num_inputs * num_perms, *hard_perm_mat.shape[1:])
             all_log_probs = self.flow.log_prob(inputs_repeated, perm_mat=hard_perm_mat_repeated)
 
             log_prob_grid = all_log_probs.reshape(inputs.shape[0], hard_perm_mat.shape[0])
             # log_prob_for_permutations = torch.mean(log_prob_grid, dim=0)
-            log_prob = torch.sum(log_prob_grid * scores, dim=-1)
+            # the scores are already softmax normalized (by gumbel_topk), so the weighted mean is a single
+            # matrix-vector product (or a row-wise dot product when each input has its own scores)
+            if scores.ndim == 1:
+                log_prob = log_prob_grid @ scores
+            else:
+                log_prob = torch.einsum("bk,bk->b", log_prob_grid, scores)
 
             if training_module is not None:
                 training_module.remember(
                     elementwise=False,
                     log_prob_to_display=log_prob,
-                    permutation_to_display=self.permutation_model.soft_permutation().repeat(inputs.shape[0], 1, 1),
+                    permutation_to_display=self.permutation_model.soft_permutation().expand(inputs.shape[0], -1, -1),
                     elementwise_input=inputs_repeated,
                     elementwise_perm_mat=hard_perm_mat_repeated,
                 )
@@ -1,5 +1,6 @@
 import torch
 import typing as th
+from ocd.models.permutation.utils import unique_permutation_matrices
 
 
 def straight_through(
@@ -32,13 +33,12 @@ def gumbel_topk(
     """
     results = dict()
     # make all the hard_perm_mats unique
-    hard_perm_mats = torch.unique(hard_permutations, dim=0) if apply_unique else hard_permutations
-    vectorized_soft_mats = soft_permutations.reshape(soft_permutations.shape[0], -1)
-    vectorized_hard_mats = hard_perm_mats.reshape(hard_perm_mats.shape[0], -1)
-    if vectorized_soft_mats.shape[0] == 1 or vectorized_soft_mats.ndim == 2:
+    hard_perm_mats = unique_permutation_matrices(hard_permutations) if apply_unique else hard_permutations
+    if soft_permutations.shape[0] == 1 or soft_permutations.ndim == 2:
         # not noisy case and using gamma directly
-        vectorized_gamma = vectorized_soft_mats.reshape(-1)
-        scores = torch.sum(vectorized_gamma * vectorized_hard_mats, dim=-1)
+        # (the multiply and the reduction are fused, without materializing a (K, n * n) temporary)
+        gamma = soft_permutations.reshape(hard_perm_mats.shape[-2:])
+        scores = torch.einsum("kij,ij->k", hard_perm_mats, gamma)
 
         if maximum_basis_size is not None and len(hard_perm_mats) > maximum_basis_size:
             # keep the indices of the top-self.maximum_basis_size elements of the scores
@@ -46,7 +46,7 @@ def gumbel_topk(
             hard_perm_mats = hard_perm_mats[indices]
             scores = scores[indices]
     else:
-        score_grid = vectorized_soft_mats @ vectorized_hard_mats.T
+        scores = torch.einsum("bij,kij->bk", soft_permutations, hard_perm_mats)
     # normalize the rows of the score grid
     score_grid = torch.nn.functional.softmax(scores, dim=-1)
     results["soft_perm_mat"] = soft_permutations
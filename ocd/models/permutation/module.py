@@ -9,6 +9,7 @@ from ocd.models.permutation.utils import (
     sample_gumbel_noise,
     listperm2matperm,
     translate_idx_ordering,
+    unique_permutation_matrices,
 )
 from lightning_toolbox import TrainingModule
 import functools
@@ -452,7 +453,7 @@ class LearnablePermutation(torch.nn.Module):
         # if the buffer is not full, add the permutations to the buffer
         all_perms = torch.cat([self.buffer[: self.buffer_commits], permutations], dim=0)
         if apply_unique:
-            all_perms = all_perms.unique(dim=0)
+            all_perms = unique_permutation_matrices(all_perms)
 
         if self.buffer_commits < self.buffer_size:
             self.buffer[: min(len(all_perms), self.buffer_size)] = all_perms[
@@ -38,7 +38,7 @@ def gumbel_log_prob(gumbel_noise: torch.Tensor) -> torch.Tensor:
     return (-gumbel_noise - torch.exp(-gumbel_noise)).sum(dim=[-1, -2])
 
 
-def sinkhorn(log_alpha, num_iters=20):
+def sinkhorn(log_alpha, num_iters=20, temperature: th.Optional[th.Union[float, torch.Tensor]] = None):
     """Performs incomplete Sinkhorn normalization to log_alpha.
     By a theorem by Sinkhorn and Knopp [1], a sufficiently well-behaved  matrix
     with positive entries can be turned into a doubly-stochastic matrix
@@ -57,18 +57,34 @@ def sinkhorn(log_alpha, num_iters=20):
             or 3D tensor (a batch of matrices of shape = [batch_size, N, N])
         num_iters: number of sinkhorn iterations (in practice, as little as 20
             iterations are needed to achieve decent convergence for N~100)
+        temperature: optional temperature (or a tensor of temperatures broadcastable to log_alpha) to divide
+            log_alpha by before normalization, this is folded into the first iteration instead of
+            materializing the scaled inputs separately
     Returns:
         A 3D tensor of close-to-doubly-stochastic matrices (2D tensors are
             converted to 3D tensors with batch_size equals to 1)
     """
-    n = log_alpha.size()[1]
+    n = log_alpha.size()[-1]
+    if temperature is not None:
+        log_alpha = log_alpha / temperature
     log_alpha = log_alpha.reshape(-1, n, n)
+    if torch.is_grad_enabled() and log_alpha.requires_grad:
+        for _ in range(num_iters):
+            log_alpha = log_alpha - (torch.logsumexp(log_alpha, dim=2, keepdim=True)).reshape(-1, n, 1)
+            log_alpha = log_alpha - (torch.logsumexp(log_alpha, dim=1, keepdim=True)).reshape(-1, 1, n)
+
+        results = torch.exp(log_alpha)
+        return results
+
+    # when no gradients are needed, normalize a single copy of log_alpha in-place with preallocated
+    # row and column buffers instead of allocating new tensors at every iteration
+    log_alpha = log_alpha.clone() if temperature is None else log_alpha.contiguous()
+    row_lse = log_alpha.new_empty(log_alpha.shape[0], n, 1)
+    col_lse = log_alpha.new_empty(log_alpha.shape[0], 1, n)
     for _ in range(num_iters):
-        log_alpha = log_alpha - (torch.logsumexp(log_alpha, dim=2, keepdim=True)).reshape(-1, n, 1)
-        log_alpha = log_alpha - (torch.logsumexp(log_alpha, dim=1, keepdim=True)).reshape(-1, 1, n)
-
-    results = torch.exp(log_alpha)
-    return results
+        log_alpha.sub_(torch.logsumexp(log_alpha, dim=2, keepdim=True, out=row_lse))
+        log_alpha.sub_(torch.logsumexp(log_alpha, dim=1, keepdim=True, out=col_lse))
+    return log_alpha.exp_()
 
 
 def is_doubly_stochastic(mat, threshold: th.Optional[float] = 1e-4) -> torch.Tensor:
@@ -179,14 +195,73 @@ def listperm2matperm(listperm: th.Union[torch.Tensor, th.List[int]], device=None
         permutation of the identity matrix, with matperm[n, i, listperm[n,i]] = 1
     """
     listperm = torch.as_tensor(listperm, device=device) if not isinstance(listperm, torch.Tensor) else listperm
-    return torch.eye(listperm.shape[-1], device=device)[listperm.long()].to(device=device, dtype=dtype)
+    listperm = listperm.to(device=device, dtype=torch.long)
+    # build all the matrices with a single scatter (instead of gathering rows of an identity matrix)
+    matperm = torch.zeros(*listperm.shape, listperm.shape[-1], device=listperm.device, dtype=dtype)
+    return matperm.scatter_(-1, listperm.unsqueeze(-1), 1)
+
+
+def unique_permutation_matrices(perm_mats: torch.Tensor) -> torch.Tensor:
+    """Removes the duplicates from a batch of permutation matrices.
+
+    Since the matrices are one-hot, they are deduplicated on their (much smaller) list form and only the unique
+    ones are turned back into matrices.
+
+    Args:
+      perm_mats: 3D tensor of permutation matrices of shape [batch_size, n_objects, n_objects]
+    Returns:
+      a 3D tensor of the unique permutation matrices (with the same dtype and device as perm_mats)
+    """
+    listperms = torch.unique(perm_mats.argmax(-1), dim=0)
+    return listperm2matperm(listperms, device=perm_mats.device, dtype=perm_mats.dtype)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_linear_assignment_solver() -> th.Callable[[np.ndarray], np.ndarray]:
+    # lap's Jonker-Volgenant implementation is much faster than scipy's for the small matrices we deal with,
+    # but it is an optional dependency
+    try:
+        from lap import lapjv
+
+        return lambda cost_matrix: lapjv(cost_matrix)[1]
+    except ImportError:
+        # keep the import here to avoid unnecessary dependency in the rest of the code
+        from scipy.optimize import linear_sum_assignment
+
+        return lambda cost_matrix: linear_sum_assignment(cost_matrix)[1]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_batch_linear_assignment_solver() -> th.Optional[th.Callable[[torch.Tensor], torch.Tensor]]:
+    # torch_linear_assignment solves a whole batch of assignment problems on the gpu, which avoids moving
+    # the matrices to the cpu and back (it is an optional dependency)
+    try:
+        from torch_linear_assignment import batch_linear_assignment
+
+        return batch_linear_assignment
+    except ImportError:
+        return None
+
+
+def linear_assignment(cost_matrix: np.ndarray) -> np.ndarray:
+    """Solves min_P sum_i,j C_i,j P_i,j for a square cost matrix C.
+
+    Uses lap.lapjv (Jonker-Volgenant) if lap is installed, and scipy.optimize.linear_sum_assignment otherwise.
+
+    Args:
+        cost_matrix: a 2D numpy array of shape [N, N]
+    Returns:
+        A 1D integer array col_ind, so that row i is assigned to column col_ind[i].
+    """
+    return _get_linear_assignment_solver()(cost_matrix)
 
 
 def hungarian(matrix_batch):
     """Solves a matching problem using the Hungarian algorithm.
 
-    This is a wrapper for the scipy.optimize.linear_sum_assignment function. It
-    solves the optimization problem max_P sum_i,j M_i,j P_i,j with P a
+    This is a wrapper for the linear_assignment function (lap.lapjv or
+    scipy.optimize.linear_sum_assignment), or for torch_linear_assignment's batched solver when the
+    batch is on a gpu and torch_linear_assignment is installed. It solves the optimization problem max_P sum_i,j M_i,j P_i,j with P a
     permutation matrix. Notice the negative sign; the reason, the original
     function solves a minimization problem.
 
@@ -199,18 +274,19 @@ def hungarian(matrix_batch):
             so that listperms[n, :] is the permutation of range(N) that solves the
             problem  max_P sum_i,j M_i,j P_i,j with M = matrix_batch[n, :, :].
     """
-    # keep the import here to avoid unnecessary dependency in the rest of the code
-    from scipy.optimize import linear_sum_assignment
-    import numpy as np
+    device = matrix_batch.device
+    batch_solver = _get_batch_linear_assignment_solver() if device.type == "cuda" else None
+    if batch_solver is not None:
+        # solve the whole batch on the gpu directly
+        return batch_solver(-matrix_batch.detach().reshape(-1, *matrix_batch.shape[-2:])).int()
 
     # perform the hungarian algorithm on the cpu
-    device = matrix_batch.device
     matrix_batch = matrix_batch.detach().cpu().numpy()
     if matrix_batch.ndim == 2:
         matrix_batch = np.reshape(matrix_batch, [1, matrix_batch.shape[0], matrix_batch.shape[1]])
     sol = np.zeros((matrix_batch.shape[0], matrix_batch.shape[1]), dtype=np.int32)
     for i in range(matrix_batch.shape[0]):
-        sol[i, :] = linear_sum_assignment(-matrix_batch[i, :])[1].astype(np.int32)
+        sol[i, :] = linear_assignment(-matrix_batch[i, :])
     return torch.from_numpy(sol).to(device)
 
 
@@ -284,7 +360,10 @@ def generate_permutations(n: int, num_samples: int = 1, return_matrix: bool = Tr
     results = torch.empty(num_samples, n).long()
     num_unique = 0
     while num_unique < num_samples:
-        all_perms = torch.cat([results[:num_unique], torch.randperm(n).reshape(1, -1)], dim=0).unique(dim=0)
+        # draw all the missing permutations at once (argsort of uniform noise gives uniform random permutations)
+        # and only keep the unique ones
+        new_perms = torch.rand(num_samples - num_unique, n).argsort(dim=-1)
+        all_perms = torch.cat([results[:num_unique], new_perms], dim=0).unique(dim=0)
         results[: len(all_perms)] = all_perms
         num_unique = len(all_perms)
 
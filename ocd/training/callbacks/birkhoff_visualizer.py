@@ -16,21 +16,85 @@ PCA and do a scatter plot to show the distribution of the permutations in that p
 import lightning.pytorch as pl
 from .logging import LoggingCallback
 import numpy as np
-from sklearn.decomposition import PCA
-import matplotlib.pyplot as plt
-from ocd.models.permutation.utils import sinkhorn
+from ocd.models.permutation.utils import sinkhorn, sample_gumbel_noise, linear_assignment
 import torch
 from itertools import permutations
+import itertools
+import functools
+import math
 import typing as th
 from lightning_toolbox import TrainingModule
-from ocd.visualization.birkhoff import visualize_exploration
-import networkx as nx
-from ocd.evaluation import backward_relative_penalty
-from scipy.optimize import linear_sum_assignment
+from ocd.evaluation import backward_relative_penalty_batch
 from lightning.pytorch import Trainer
 
+try:
+    import numba
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
 MARKERS = ["^", "o", "x"]
 
+if NUMBA_AVAILABLE:
+
+    @numba.njit(cache=True, parallel=True)
+    def _farthest_point_sampling_kernel(points: np.array, num_points: int) -> np.array:
+        # same as the numpy implementation in get_core_points (with squared distances, which keeps the argmax)
+        min_dist = np.full(points.shape[0], np.inf)
+        sampled_indices = np.empty(num_points, dtype=np.int64)
+        idx = 0
+        for i in range(num_points):
+            sampled_indices[i] = idx
+            for j in numba.prange(points.shape[0]):
+                dist = 0.0
+                for k in range(points.shape[1]):
+                    diff = points[j, k] - points[idx, k]
+                    dist += diff * diff
+                min_dist[j] = min(min_dist[j], dist)
+            idx = np.argmax(min_dist)
+        return sampled_indices
+
+    @numba.njit(cache=True, parallel=True)
+    def _closest_core_points_kernel(
+        flat_core_points: np.array, core_points_sq_norms: np.array, col_ind: np.array
+    ) -> np.array:
+        # same as the numpy implementation in cluster_particles (the first closest core point is chosen upon ties)
+        permutation_size = col_ind.shape[1]
+        clusters = np.empty(col_ind.shape[0], dtype=np.int64)
+        for s in numba.prange(col_ind.shape[0]):
+            best_dist, best_idx = np.inf, 0
+            for c in range(flat_core_points.shape[0]):
+                inner = 0.0
+                for j in range(permutation_size):
+                    inner += flat_core_points[c, j * permutation_size + col_ind[s, j]]
+                dist = core_points_sq_norms[c] - 2 * inner
+                if dist < best_dist:
+                    best_dist, best_idx = dist, c
+            clusters[s] = best_idx
+        return clusters
+
+
+def get_permutation_matrices(permutation_size: int) -> np.array:
+    """
+    Returns all the permutation matrices of size permutation_size (the vertices of the Birkhoff polytope),
+    with the permutations in lexicographic order.
+
+    Returns:
+        vertices: a tensor of shape (permutation_size!, permutation_size, permutation_size), where
+            vertices[k, perm[j], j] = 1 for the k'th permutation perm
+    """
+    num_perms = math.factorial(permutation_size)
+    perms = np.fromiter(
+        itertools.chain.from_iterable(permutations(range(permutation_size))),
+        dtype=np.int64,
+        count=num_perms * permutation_size,
+    ).reshape(num_perms, permutation_size)
+    vertices = np.zeros((num_perms, permutation_size, permutation_size))
+    vertices[np.arange(num_perms)[:, None], perms, np.arange(permutation_size)] = 1
+    return vertices
+
 
 def get_core_points(
     permutation_size: int,
@@ -60,74 +124,53 @@ def get_core_points(
         core_points: a tensor of shape (num_core_points, permutation_size, permutation_size)
     """
 
-    # create all the permutation matrices of size permutation_size
-    # and append them to the core_points
-    core_points = None
+    # create all the permutation matrices of size permutation_size at once
+    vertices = get_permutation_matrices(permutation_size)
 
+    core_points = []
     # add birkhoff_vertices to the core_points
     if birkhoff_vertices:
-        for perm in permutations(range(permutation_size)):
-            # create a permutation matrix out of perm
-            perm_mat = np.zeros((permutation_size, permutation_size))
-            perm_mat[perm, np.arange(permutation_size)] = 1
-            # extend perm_mat in the first dimension
-            perm_mat = np.expand_dims(perm_mat, axis=0)
-            # concatenate perm_mat to the birkoff_vertices
-            core_points = perm_mat if core_points is None else np.concatenate([core_points, perm_mat], axis=0)
-
-    # add birkhoff_edges to the core_points
+        core_points.append(vertices)
+
+    # add birkhoff_edges to the core_points (the mid-way points of every pair of vertices)
+    # each unordered pair is only computed once (the pair (j, i) is a duplicate of (i, j)), and the pairs (i, i)
+    # are skipped when the vertices themselves are already included
     if birkhoff_edges:
-        edge_points = []
-        for perm1 in permutations(range(permutation_size)):
-            for perm2 in permutations(range(permutation_size)):
-                # create a permutation matrix out of perm
-                perm_mat1 = np.zeros((permutation_size, permutation_size))
-                perm_mat1[perm1, np.arange(permutation_size)] = 1
-                # create a permutation matrix out of perm
-                perm_mat2 = np.zeros((permutation_size, permutation_size))
-                perm_mat2[perm2, np.arange(permutation_size)] = 1
-                # create the edge point
-                edge_point = (perm_mat1 + perm_mat2) / 2
-                # append the edge point to the edge_points
-                edge_points.append(edge_point)
-        # concatenate all the edge points to the core_points
-        t = np.stack(edge_points, axis=0)
-        core_points = t if core_points is None else np.concatenate([core_points, t], axis=0)
-
-    # Now iteratively sample num_points from the core_points
-    sampled_core_points = None
-    num_points = min(num_points, core_points.shape[0])
+        first, second = np.triu_indices(vertices.shape[0], k=1 if birkhoff_vertices else 0)
+        core_points.append(0.5 * (vertices[first] + vertices[second]))
+    core_points = core_points[0] if len(core_points) == 1 else np.concatenate(core_points, axis=0)
+
+    # if all the core points are requested there is nothing to sample
+    if num_points >= core_points.shape[0]:
+        return core_points
+
+    # Now iteratively sample num_points from the core_points (farthest point sampling)
+    flat_core_points = core_points.reshape(core_points.shape[0], -1)
+    if NUMBA_AVAILABLE:
+        return core_points[_farthest_point_sampling_kernel(np.ascontiguousarray(flat_core_points), num_points)]
+    from scipy.spatial.distance import cdist
+
+    # the distance of every core point to the closest sampled point so far
+    # (updated incrementally with the distances to the newly sampled point)
+    min_dist = np.full(core_points.shape[0], np.inf)
+    sampled_indices = np.empty(num_points, dtype=np.int64)
+    idx = 0  # the first sampled point is the first core point
     for i in range(num_points):
-        # if this is the first point, just sample the first point
-        if i == 0:
-            sampled_core_points = core_points[0]
-            # expand the sampled_core_points in the first dimension
-            sampled_core_points = np.expand_dims(sampled_core_points, axis=0)
-        else:
-            set_a = sampled_core_points.reshape(sampled_core_points.shape[0], -1)
-            set_b = core_points.reshape(core_points.shape[0], -1)
-            # get an i x core_points.shape[0] matrix of distances
-            # between the sampled_core_points and the core_points
-            dist = np.linalg.norm(
-                np.expand_dims(set_a, axis=1) - np.expand_dims(set_b, axis=0),
-                axis=2,
-            )
-            # for each core_point corresponding to the columns in dist,
-            # get the minimum distance from the sampled_core_points
-            dist = np.min(dist, axis=0)
-
-            # get the column with the maximum distance
-            idx = np.argmax(dist)
-            # add the point with the maximum distance to the sampled_core_points
-            sampled_core_points = np.concatenate(
-                [sampled_core_points, np.expand_dims(core_points[idx], axis=0)], axis=0
-            )
+        sampled_indices[i] = idx
+        dist = cdist(flat_core_points[idx][None], flat_core_points)[0]
+        np.minimum(min_dist, dist, out=min_dist)
+        # get the core point with the maximum distance from the sampled points
+        idx = np.argmax(min_dist)
 
     # return the sampled_core_points
-    return sampled_core_points
+    return core_points[sampled_indices]
 
 
-def cluster_particles(all_points: np.array, core_points: np.array) -> np.array:
+def cluster_particles(
+    all_points: np.array,
+    core_points: np.array,
+    core_points_sq_norms: th.Optional[np.array] = None,
+) -> np.array:
     """
     This function clusters all the particles according to how close they are to
     core_points
@@ -135,39 +178,73 @@ def cluster_particles(all_points: np.array, core_points: np.array) -> np.array:
     Args:
         all_points: [n_samples, permutation_size, permutation_size]
         core_points: [n_core_points, permutation_size, permutation_size]
+        core_points_sq_norms: (optional) the precomputed squared frobenius norms of the core_points
     Returns:
         clusters: a one dimensional np.array of size n_samples that assigns each point to
                     a cluster
     """
-    # cluster doubly_stochastic_matrices according to what index of
-    # core_points they are closest to
-    clusters = np.zeros(all_points.shape[0])
-    for i, mat in enumerate(all_points):
-        # get the index of the closest vertex
-        row_ind, col_ind = linear_sum_assignment(-mat)
-        mat_after_hungarian = np.zeros_like(mat)
-        mat_after_hungarian[row_ind, col_ind] = 1
-        closest_vertex = np.argmin(np.linalg.norm(core_points - mat_after_hungarian, axis=(1, 2)))
-        clusters[i] = closest_vertex
-    return clusters
-
-
-def get_birkhoff_samples(permutation_size: int, n_sample: int = 100) -> np.array:
+    # snap every matrix to its closest permutation matrix: the row-wise argmax is the optimal assignment
+    # whenever it is a permutation (which is almost always the case for sinkhorn outputs), and the hungarian
+    # algorithm is only used for the remaining matrices
+    permutation_size = all_points.shape[-1]
+    col_ind = all_points.argmax(axis=-1)
+    is_permutation = (np.sort(col_ind, axis=-1) == np.arange(permutation_size)).all(axis=-1)
+    for i in np.flatnonzero(~is_permutation):
+        col_ind[i] = linear_assignment(-all_points[i])
+
+    # cluster the (hard) doubly_stochastic_matrices according to what index of core_points they are closest to
+    # using ||c - h||^2 = ||c||^2 + ||h||^2 - 2 <c, h> (||h||^2 is the same for all the core points), where
+    # <c, h> is the sum of the entries of c selected by the permutation h (no dense hard matrices are built)
+    core_points_sq_norms = (
+        (core_points * core_points).sum(axis=(1, 2)) if core_points_sq_norms is None else core_points_sq_norms
+    )
+    if NUMBA_AVAILABLE:
+        flat_core_points = np.ascontiguousarray(core_points.reshape(core_points.shape[0], -1))
+        return _closest_core_points_kernel(
+            flat_core_points, np.asarray(core_points_sq_norms, dtype=flat_core_points.dtype), col_ind
+        ).astype(np.float64)
+    flat_core_points_t = core_points.reshape(core_points.shape[0], -1).T  # [permutation_size ** 2, n_core_points]
+    inner = flat_core_points_t[np.arange(permutation_size) * permutation_size + col_ind].sum(axis=1)
+    dist = core_points_sq_norms - 2 * inner
+    return dist.argmin(axis=-1).astype(np.float64)
+
+
+def get_birkhoff_samples(
+    permutation_size: int,
+    n_sample: int = 100,
+    seed: th.Optional[int] = None,
+    device: th.Optional[torch.device] = None,
+) -> np.array:
     """
     Args:
         permutation_size: the size of the permutation matrices
         n_sample: the number of samples to draw from the polytope
+        seed: the seed for sampling the gumbel noises (if None, it is drawn from numpy's random state)
+        device: the device to run the sinkhorn operator on (defaults to cpu)
     Returns:
-        polytope: a tensor of shape (n_sample, permutation_size, permutation_size) as a numpy array
+        polytope: a tensor of shape (3 * n_sample, permutation_size, permutation_size) as a numpy array
     """
-    # sample n_sample x permutation_size x permutation_size gumbel noises
-    gumbel_noise = np.random.gumbel(size=(n_sample, permutation_size, permutation_size))
-    # turn the gumbel noise into a torch tensor
-    gumbel_noise = torch.from_numpy(gumbel_noise).float()
-    polytope = (
-        sinkhorn(torch.cat([gumbel_noise, gumbel_noise / 0.1, gumbel_noise / 0.05], dim=0), 100).detach().cpu().numpy()
-    )
-    return polytope
+    seed = np.random.randint(0, 2**31 - 1) if seed is None else seed
+    generator = torch.Generator(device=device or "cpu").manual_seed(seed)
+    # sample n_sample x permutation_size x permutation_size gumbel noises directly as a torch tensor
+    gumbel_noise = sample_gumbel_noise(n_sample, permutation_size, permutation_size, generator=generator, device=device)
+    # normalize the noises with 3 different temperatures (1, 0.1, 0.05) in a single sinkhorn call
+    temperatures = torch.tensor([1.0, 0.1, 0.05], device=device).view(3, 1, 1, 1)
+    polytope = sinkhorn(gumbel_noise.unsqueeze(0), 100, temperature=temperatures)
+    # float32 is more than enough precision for the (2D) visualizations
+    return polytope.cpu().numpy().astype(np.float32, copy=False)
+
+
+def _concatenate_to_numpy(*tensor_lists: th.List[torch.Tensor]) -> th.List[np.array]:
+    """
+    Concatenates each list of tensors (on their dimension 0) and returns them as numpy arrays (of their
+    promoted dtype), with a single device to host transfer for all of them.
+    """
+    concatenated = [torch.cat(tensors, dim=0).detach() for tensors in tensor_lists]
+    dtype = functools.reduce(torch.promote_types, [t.dtype for t in concatenated])
+    flat = torch.cat([t.reshape(-1).to(dtype) for t in concatenated]).cpu().numpy()
+    sections = np.cumsum([t.numel() for t in concatenated])[:-1]
+    return [array.reshape(t.shape) for array, t in zip(np.split(flat, sections), concatenated)]
 
 
 class BirkhoffCallback(LoggingCallback):
@@ -191,6 +268,11 @@ class BirkhoffCallback(LoggingCallback):
         add_permutation_to_name: bool = True,
         # Reject outlier cost values
         reject_outlier_factor: th.Optional[float] = 0.1,
+        # keep the logged values on the device and transfer them to the cpu at once on evaluation
+        keep_logs_on_device: bool = False,
+        # skip the visualization if the permutation model has not changed since the last one
+        skip_if_gamma_unchanged: bool = False,
+        gamma_change_tolerance: float = 0.0,
     ) -> None:
         """
         This is a lightning callback that visualizes how the model explores and behaves.
@@ -214,6 +296,9 @@ class BirkhoffCallback(LoggingCallback):
             scm: the SCM object to use for finding the points associated with each ordering
             add_permutation_to_name: If this is set to true, then the average of each cluster
                                      is written in the legend as an approximate permutation
+            skip_if_gamma_unchanged: If this is set to true, the (expensive) visualization is skipped whenever
+                                     the gamma parameter of the permutation model is within
+                                     gamma_change_tolerance of its value at the last visualization
         """
         super().__init__(
             evaluate_every_n_epochs=evaluate_every_n_epochs,
@@ -221,13 +306,28 @@ class BirkhoffCallback(LoggingCallback):
             epoch_buffer_size=epoch_buffer_size,
             log_training=log_training,
             log_validation=log_validation,
+            keep_logs_on_device=keep_logs_on_device,
         )
 
+        # sklearn is only imported once the callback is actually created (it is slow to import)
+        from sklearn.decomposition import PCA, IncrementalPCA
+
         self.fit_every_time = fit_every_time
-        self.pca = PCA(n_components=2)
+        # when fitting every time, the PCA is updated incrementally with the permutations logged since the last fit,
+        # otherwise it is fit once with the randomized solver (only 2 components are needed, a full SVD is wasteful)
+        self.pca = (
+            IncrementalPCA(n_components=2, batch_size=256)
+            if fit_every_time
+            else PCA(n_components=2, svd_solver="randomized", random_state=seed)
+        )
+        self.pca_seen_count = 0
 
         self.add_permutation_to_name = add_permutation_to_name
 
+        self.skip_if_gamma_unchanged = skip_if_gamma_unchanged
+        self.gamma_change_tolerance = gamma_change_tolerance
+        self.last_visualized_gamma = None
+
         self.seed = seed
         self.reject_outlier_factor = reject_outlier_factor
         # set the seed of numpy
@@ -257,8 +357,13 @@ class BirkhoffCallback(LoggingCallback):
     
     def on_train_start(self, trainer: Trainer, pl_module: TrainingModule) -> None:
         
-        causal_graph = trainer.datamodule.data.dag
-        permutation_size = causal_graph.number_of_nodes()
+        # the causal graph is only needed for scoring the birkhoff vertices (it might not be available)
+        causal_graph = getattr(trainer.datamodule.data, "dag", None)
+        permutation_size = (
+            causal_graph.number_of_nodes()
+            if causal_graph is not None
+            else pl_module.model.permutation_model.num_features
+        )
         self.permutation_size = permutation_size
         
         if self.write_cost_values:
@@ -269,62 +374,101 @@ class BirkhoffCallback(LoggingCallback):
                 birkhoff_vertices=self.core_points_has_birkhoff_vertices,
                 birkhoff_edges=self.core_points_has_birkhoff_edges,
             )
+            self.core_points_sq_norms = (self.core_points * self.core_points).sum(axis=(1, 2))
             
         if not self.fit_every_time:
-            self.polytope = get_birkhoff_samples(permutation_size)
+            self.polytope = get_birkhoff_samples(permutation_size, seed=self.seed)
             # train a PCA on all the elements of the polytope
-            self.pca.fit(self.polytope.reshape(-1, permutation_size * permutation_size))
-            self.transformed_polytope = self.pca.transform(
-                self.polytope.reshape(-1, permutation_size * permutation_size)
-            )
+            # (fit_transform is not used on purpose, with the randomized solver it returns U * S which does not
+            # exactly match the transform that is later applied to the logged permutations)
+            flat_polytope = np.ascontiguousarray(self.polytope.reshape(-1, permutation_size * permutation_size))
+            self.pca.fit(flat_polytope)
+            self.transformed_polytope = self.pca.transform(flat_polytope).astype(np.float32, copy=False)
         
         # For each of the vertex points which are the permutation
         # set their delimiters according to the number of backward edges
         # they have. If something has a low number of backward edges, then
         # it will have a larger delimiter. This is used to determine the correct
         # orderings
-        self.birkhoff_vertices = get_core_points(
-            permutation_size, permutation_size**permutation_size, birkhoff_edges=False, birkhoff_vertices=True
-        )
-
-        self.birkhoff_vertex_scores = []
-        self.birkhoff_vertex_names = []
-        for perm in self.birkhoff_vertices:
-            ordering = perm.argmax(-2).tolist()
-            ordering_str = "-".join([str(x) for x in ordering])
-            self.birkhoff_vertex_names.append(ordering_str)
-            self.birkhoff_vertex_scores.append(backward_relative_penalty(ordering, causal_graph))
-        
-        if not self.write_permutation_names:
-            self.birkhoff_vertex_names = None
-        self.birkhoff_vertex_scores = np.array(self.birkhoff_vertex_scores)
+        # (if there is no causal graph to score the vertices and no names are needed, the n! vertices are skipped)
+        self.birkhoff_vertices, self.birkhoff_vertex_scores, self.birkhoff_vertex_names = None, None, None
+        if causal_graph is not None or self.write_permutation_names:
+            self.birkhoff_vertices = get_permutation_matrices(permutation_size)
+            orderings = self.birkhoff_vertices.argmax(-2)
+            if self.write_permutation_names:
+                # a single tolist() call on the whole array, so only the string joins are done per ordering
+                self.birkhoff_vertex_names = ["-".join(map(str, ordering)) for ordering in orderings.tolist()]
+            if causal_graph is not None:
+                self.birkhoff_vertex_scores = backward_relative_penalty_batch(orderings, causal_graph)
 
         
         return super().on_fit_end(trainer, pl_module)
     
     def _print_unique_permutations(self, logged_permutations):
         real_logged_permutations = logged_permutations.argmax(axis=-2)
+        n = real_logged_permutations.shape[-1]
         # get the unique rows and the number of times they appear
-        unique_rows, counts = np.unique(real_logged_permutations, axis=0, return_counts=True)
+        if n**n < np.iinfo(np.int64).max:
+            # encode each ordering as a single integer (the most significant digit first so that the rows
+            # come out in the same lexicographic order), unique on a flat integer array is much faster than on rows
+            powers = n ** np.arange(n - 1, -1, -1, dtype=np.int64)
+            codes = real_logged_permutations.astype(np.int64) @ powers
+            _, first_indices, counts = np.unique(codes, return_index=True, return_counts=True)
+            unique_rows = real_logged_permutations[first_indices]
+        else:
+            unique_rows, counts = np.unique(real_logged_permutations, axis=0, return_counts=True)
         print("Permutations that were seen:")
         for row, count in zip(unique_rows, counts):
             print(row, " : ", count, " times")
 
     def evaluate(self, trainer: pl.Trainer, pl_module: TrainingModule) -> None:
-        # Get the logged permutations
-        logged_permutations = torch.cat(self.all_logged_values["permutation_to_display"], dim=0).detach().cpu().numpy()
-        logged_losses = -torch.cat(self.all_logged_values["log_prob_to_display"], dim=0).detach().cpu().numpy()
-
-        # Use the hard permutations if available for clustering
-        permutations_used_for_clustering = (
-            torch.cat(self.all_logged_values["elementwise_perm_mat"], dim=0).detach().cpu().numpy()
-        )
-        if len(logged_permutations) != len(permutations_used_for_clustering):
-            permutations_used_for_clustering = logged_permutations
-
-        # If we are to train the PCA every time, then we should fit it with the logged permutations here
+        if self.skip_if_gamma_unchanged:
+            gamma = pl_module.model.permutation_model.gamma.detach()
+            if self.last_visualized_gamma is not None and torch.allclose(
+                gamma, self.last_visualized_gamma, rtol=0.0, atol=self.gamma_change_tolerance
+            ):
+                return
+            self.last_visualized_gamma = gamma.clone()
+
+        # matplotlib is only needed (and imported) once there is something to draw
+        from ocd.visualization.birkhoff import visualize_exploration
+
+        # Get the logged permutations, losses and the hard permutations (used for clustering if available)
+        # they are concatenated on their device and transferred to the cpu with a single copy
+        # (the hard permutations are only used if there is one for each logged permutation, so the lengths
+        # are checked on the lists to avoid concatenating and transferring them for nothing)
+        permutation_list = self.all_logged_values["permutation_to_display"]
+        clustering_list = self.all_logged_values["elementwise_perm_mat"]
+        use_clustering_list = sum(len(t) for t in clustering_list) == sum(len(t) for t in permutation_list)
+        tensor_lists = [permutation_list, self.all_logged_values["log_prob_to_display"]]
+        if use_clustering_list:
+            tensor_lists.append(clustering_list)
+        logged_permutations, logged_log_probs, *rest = _concatenate_to_numpy(*tensor_lists)
+        logged_losses = -logged_log_probs
+        permutations_used_for_clustering = rest[0] if use_clustering_list else logged_permutations
+
+        # If we are to train the PCA every time, then we should update it with the new logged permutations here
         if self.fit_every_time:
-            self.pca.fit(logged_permutations.reshape(-1, self.permutation_size * self.permutation_size))
+            buffer = self.all_logged_values["permutation_to_display"]
+            num_new = min(self.num_logged_values["permutation_to_display"] - self.pca_seen_count, len(buffer))
+            if num_new > 0:
+                # the newest permutations are the tail of logged_permutations, which is already on the cpu
+                num_new_rows = sum(len(t) for t in buffer[-num_new:])
+                new_permutations = logged_permutations[len(logged_permutations) - num_new_rows :]
+                new_permutations = new_permutations.reshape(-1, self.permutation_size * self.permutation_size)
+                # partial_fit needs at least n_components samples, otherwise wait for more permutations
+                if new_permutations.shape[0] >= self.pca.n_components:
+                    # partial_fit does not split its input by itself, so the new permutations are streamed in
+                    # (roughly) batch_size chunks to keep every update a small SVD
+                    num_chunks = max(1, new_permutations.shape[0] // self.pca.batch_size)
+                    for chunk in np.array_split(new_permutations, num_chunks):
+                        self.pca.partial_fit(chunk)
+                    self.pca_seen_count = self.num_logged_values["permutation_to_display"]
+            # until enough permutations have been seen for a first fit, there is nothing to visualize
+            if not hasattr(self.pca, "components_"):
+                # (the current gamma has not been visualized, so it should not be skipped next time)
+                self.last_visualized_gamma = None
+                return
 
         # Now get a permutation without noise from the model for representing the current state
         # of the permutation learner
@@ -335,7 +479,9 @@ class BirkhoffCallback(LoggingCallback):
         # If the logger wants to write the cost values, then we should cluster the points
         # and write the cost values at the centroid of each cluster
         if self.write_cost_values:
-            clusters = cluster_particles(permutations_used_for_clustering, self.core_points)
+            clusters = cluster_particles(
+                permutations_used_for_clustering, self.core_points, core_points_sq_norms=self.core_points_sq_norms
+            )
 
         # Generate the image
         img = visualize_exploration(
@@ -277,8 +277,8 @@ class InterventionCallback(pl.Callback):
         canvas = FigureCanvas(fig)
         canvas.draw()  # draw the canvas, cache the renderer
 
-        image_flat = np.frombuffer(canvas.tostring_rgb(), dtype="uint8")  # (H * W * 3,)
-        plot = image_flat.reshape(*fig.canvas.get_width_height(), 3)  # (H, W, 3)
+        # view the rendered RGBA buffer directly (no byte-string round trip) and drop the alpha channel
+        plot = np.asarray(canvas.buffer_rgba())[..., :3].copy()  # (H, W, 3)
 
         trainer.logger.log_image(self.title, images=[plot], caption=[self.caption])
         return return_value
@@ -77,9 +77,13 @@ class PermutationEvaluationCallback(Callback):
 
     def _log_results(self, pl_module: TrainingModule) -> None:
         ret = self._get_res_dict(pl_module)
-        for key1, val1 in ret["metrics"].items():
-            for key2, val2 in val1.items():
-                pl_module.log(f"metrics/{key1}-{key2}", float(val2))
+        pl_module.log_dict(
+            {
+                f"metrics/{key1}-{key2}": float(val2)
+                for key1, val1 in ret["metrics"].items()
+                for key2, val2 in val1.items()
+            }
+        )
 
     def on_fit_start(self, trainer: Trainer, pl_module: TrainingModule) -> None:
         data = trainer.datamodule.data.data
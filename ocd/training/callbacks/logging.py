@@ -25,8 +25,12 @@ class LoggingCallback(Callback):
         epoch_buffer_size: int = 1,
         log_training: bool = True,
         log_validation: bool = False,
+        # if True, the logged tensors are kept on their device (only detached) instead of being moved to the cpu
+        # on every batch, so that the child classes can transfer them all at once when evaluating
+        keep_logs_on_device: bool = False,
     ) -> None:
         super().__init__()
+        self.keep_logs_on_device = keep_logs_on_device
         self.evaluate_every_n_epochs = evaluate_every_n_epochs
         self.epoch_buffer_size = epoch_buffer_size
         self.log_training = log_training
@@ -35,6 +39,9 @@ class LoggingCallback(Callback):
         self.epoch_counter = 0
 
         self.all_logged_values = defaultdict(list)
+        # the total number of values logged for each key (including the ones that are popped out of the buffer),
+        # can be used by the child classes to only process the new values since their last evaluation
+        self.num_logged_values = defaultdict(int)
 
         self.validation_batches_in_epoch = 0
         self.training_batches_in_epoch = 0
@@ -60,11 +67,8 @@ class LoggingCallback(Callback):
         if self.log_training and self.logging_needed():
             self.training_batches_in_epoch += 1
             for key, item in pl_module.objective.latch.items():
-                if isinstance(item, torch.Tensor):
-                    self.all_logged_values[key].append(item.detach().cpu())
-                else:
-                    self.all_logged_values[key].append(item)
-            self.all_logged_values["loss"].append(pl_module.objective.results_latch["loss"].detach().cpu())
+                self.log_value(key, item)
+            self.log_value("loss", pl_module.objective.results_latch["loss"])
         return super().on_train_batch_end(trainer, pl_module, outputs, batch, batch_idx)
 
     def on_validation_batch_end(
@@ -79,13 +83,16 @@ class LoggingCallback(Callback):
         if self.log_validation and self.logging_needed():
             self.validation_batches_in_epoch += 1
             for key, item in pl_module.objective.latch.items():
-                if isinstance(item, torch.Tensor):
-                    self.all_logged_values[key].append(item.detach().cpu())
-                else:
-                    self.all_logged_values[key].append(item)
+                self.log_value(key, item)
 
         return super().on_train_batch_end(trainer, pl_module, outputs, batch, batch_idx)
 
+    def log_value(self, key: str, item: th.Any) -> None:
+        if isinstance(item, torch.Tensor):
+            item = item.detach() if self.keep_logs_on_device else item.detach().cpu()
+        self.all_logged_values[key].append(item)
+        self.num_logged_values[key] += 1
+
     def check_should_evaluate(self, trainer: pl.Trainer, pl_module: TrainingModule) -> bool:
         if self.evaluate_every_n_epoch_logic is None:
             return self.epoch_counter % self.evaluate_every_n_epochs == 0
@@ -6,7 +6,6 @@ from lightning_toolbox import TrainingModule
 from lightning.pytorch.utilities.types import STEP_OUTPUT
 import torch
 from lightning.pytorch import Trainer
-from lightning_toolbox import TrainingModule
 
 
 class PhaseChangerCallback(Callback):
@@ -124,53 +123,71 @@ class PhaseChangerCallback(Callback):
         batch: Any,
         batch_idx: int,
     ) -> None:
-        outputs = pl_module.objective.results_latch
-
-        if "loss" not in outputs:
-            raise Exception(f"The validation step must return a loss value but got the following instead:\n{outputs}")
+        # look up the loss directly (the missing loss is the exceptional case, not worth a check on every batch)
+        try:
+            loss = pl_module.objective.results_latch["loss"]
+        except KeyError:
+            raise Exception(
+                "The validation step must return a loss value but got the following instead:\n"
+                f"{pl_module.objective.results_latch}"
+            )
         # If the current loss is less than (min + eps) then reset the patience
         # otherwise, decrement the patience and if the patience reaches zero, change the phase
-        self.running_avg = (self.running_avg * batch_idx + outputs["loss"]) / (batch_idx + 1)
-        if self.num_validation_batches < batch_idx + 1:
-            self.num_validation_batches = batch_idx + 1
+        # the running average is kept as a detached (on-device) tensor, it is only read back to the host once
+        # per epoch when the phase changing condition is checked, instead of syncing on every batch
+        if torch.is_tensor(loss):
+            loss = loss.detach()
+        num_batches = batch_idx + 1
+        # incremental (Welford-style) running mean of the loss over the batches of the current epoch
+        self.running_avg += (loss - self.running_avg) / num_batches
+        # the number of batches per epoch is only known after the first epoch, until then nothing is checked
+        if self.num_validation_batches < num_batches:
+            self.num_validation_batches = num_batches
+            return
+        # the phase changing condition is only checked on the last batch of every epoch
+        if num_batches != self.num_validation_batches:
+            return
+
+        should_change_phase = False
+
+        current_loss = self.running_avg
+        if torch.is_tensor(current_loss):
+            current_loss = current_loss.item()
+
+        self.cooldown_counter = max(0, self.cooldown_counter - 1)
+
+        if current_loss <= self.running_minimum_loss * (1 - self.threshold):
+            self.patience_remaining = self.baseline_patience
         else:
-            if self.num_validation_batches == batch_idx + 1:
-                should_change_phase = False
-
-                current_loss = self.running_avg
-
-                self.cooldown_counter = max(0, self.cooldown_counter - 1)
-
-                if current_loss <= self.running_minimum_loss * (1 - self.threshold):
-                    self.patience_remaining = self.baseline_patience
-                else:
-                    self.patience_remaining = max(0, self.patience_remaining - 1)
-                    if self.patience_remaining == 0 and self.cooldown_counter == 0:
-                        should_change_phase = True
-
-                # Take the minimum of current loss and the running minimum
-                self.running_minimum_loss = min(self.running_minimum_loss, current_loss)
-
-                if self.log_onto_logger:
-                    pl_module.log("phase-changer/current_phase_changing_loss", current_loss)
-                    pl_module.log("phase-changer/running_minimum_phase_changing_loss", self.running_minimum_loss)
-                    pl_module.log("phase-changer/patience_remaining", float(self.patience_remaining))
-                    pl_module.log(
-                        "phase-changer/current_phase-0-maximization-1-expectation",
-                        0.0 if pl_module.current_phase == "maximization" else 1.0,
-                    )
-                    pl_module.log("phase-changer/cooldown-counter", float(self.cooldown_counter))
-
-                    if should_change_phase:
-                        self.change_phase(trainer, pl_module)
+            self.patience_remaining = max(0, self.patience_remaining - 1)
+            if self.patience_remaining == 0 and self.cooldown_counter == 0:
+                should_change_phase = True
+
+        # Take the minimum of current loss and the running minimum
+        self.running_minimum_loss = min(self.running_minimum_loss, current_loss)
+
+        if self.log_onto_logger:
+            pl_module.log_dict(
+                {
+                    "phase-changer/current_phase_changing_loss": current_loss,
+                    "phase-changer/running_minimum_phase_changing_loss": self.running_minimum_loss,
+                    "phase-changer/patience_remaining": float(self.patience_remaining),
+                    "phase-changer/current_phase-0-maximization-1-expectation": (
+                        0.0 if pl_module.current_phase == "maximization" else 1.0
+                    ),
+                    "phase-changer/cooldown-counter": float(self.cooldown_counter),
+                }
+            )
+
+            if should_change_phase:
+                self.change_phase(trainer, pl_module)
 
     def on_train_batch_end(
         self, trainer: Trainer, pl_module: TrainingModule, outputs: STEP_OUTPUT, batch: Any, batch_idx: int
     ) -> None:
-        ret = super().on_train_batch_end(trainer, pl_module, outputs, batch, batch_idx)
         if self.monitor_training:
             self.monitor_and_take_action(trainer, pl_module, outputs, batch, batch_idx)
-        return ret
+        return super().on_train_batch_end(trainer, pl_module, outputs, batch, batch_idx)
 
     def on_validation_batch_end(
         self,
@@ -181,8 +198,6 @@ class PhaseChangerCallback(Callback):
         batch_idx: int,
         dataloader_idx: th.Optional[int] = None,
     ) -> None:
-        ret = super().on_validation_batch_end(trainer, pl_module, outputs, batch, batch_idx, dataloader_idx)
         if self.monitor_validation:
             self.monitor_and_take_action(trainer, pl_module, outputs, batch, batch_idx)
-
-        return ret
+        return super().on_validation_batch_end(trainer, pl_module, outputs, batch, batch_idx, dataloader_idx)
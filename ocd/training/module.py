@@ -68,6 +68,8 @@ class OCDafTrainingModule(TrainingModule):
             optimizer_idx=optimizer_idx, batch_idx=batch_idx, epoch=self.current_epoch
         ):
             return None
+        if not is_val:
+            self.activate_optimizer_parameters(optimizer_idx)
 
         results, factors = self.objective(
             batch=batch,
@@ -90,20 +92,17 @@ class OCDafTrainingModule(TrainingModule):
 
             opt.step()
 
-            self.log(f"lr/{optimizer_idx}", opt.param_groups[0]["lr"], on_step=True, on_epoch=True, prog_bar=True)
+            # log all the step values with a single call
+            step_values = {f"lr/{optimizer_idx}": opt.param_groups[0]["lr"]}
             if self.model.permutation_model is not None:
-                self.log(f"Gumbel-std", 
-                        self.model.permutation_model.gumbel_noise_std(training_module=self), 
-                        on_step=True, 
-                        on_epoch=True, 
-                        prog_bar=True)
+                step_values["Gumbel-std"] = self.model.permutation_model.gumbel_noise_std(training_module=self)
+            self.log_dict(step_values, on_step=True, on_epoch=True, prog_bar=True)
             return loss.mean() if isinstance(loss, torch.Tensor) else loss
         elif self._schedulers is not None:
+            # the running averages are kept on the device, and only read once the schedulers are stepped
             for i, sched in enumerate(self._schedulers):
                 monitor_key = sched["monitor"]
-                self.running_avg[i] = (
-                    self.running_avg[i] * batch_idx + results[monitor_key].detach().cpu().item()
-                ) / (batch_idx + 1)
+                self.running_avg[i] = (self.running_avg[i] * batch_idx + results[monitor_key].detach()) / (batch_idx + 1)
 
     def on_train_epoch_end(self):
         ret = super().on_train_epoch_end()
@@ -117,7 +116,7 @@ class OCDafTrainingModule(TrainingModule):
             scheduler = self._schedulers[scheduler_idx]["scheduler"] if self._schedulers else None
             if scheduler is not None:
                 if isinstance(scheduler, torch.optim.lr_scheduler.ReduceLROnPlateau):
-                    scheduler.step(self.running_avg[scheduler_idx])
+                    scheduler.step(float(self.running_avg[scheduler_idx]))
                 else:
                     scheduler.step()
         return ret
@@ -128,7 +127,46 @@ class OCDafTrainingModule(TrainingModule):
     def _get_optimizers(self):
         return self._optimizers
 
+    def activate_optimizer_parameters(self, optimizer_idx: int):
+        """
+        Only lets the parameters of the given optimizer require gradients, so that the backward pass of a phase
+        does not compute the gradients of the parameters that are not going to be updated in that phase.
+
+        The flags are only toggled (in bulk) when the active optimizer changes, not on every step, and the
+        parameters to enable and disable for each optimizer are only collected once per set of optimizers.
+        """
+        if (
+            optimizer_idx == self.active_optimizer_idx
+            or not isinstance(self._optimizers, (list, tuple))
+            or len(self._optimizers) < 2
+        ):
+            return
+        if optimizer_idx not in self.optimizer_parameter_toggles:
+            active_params = {
+                id(p): p for group in self._optimizers[optimizer_idx].param_groups for p in group["params"]
+            }
+            inactive_params = {
+                id(p): p
+                for opt in self._optimizers
+                for group in opt.param_groups
+                for p in group["params"]
+                if id(p) not in active_params
+            }
+            self.optimizer_parameter_toggles[optimizer_idx] = (
+                list(active_params.values()),
+                list(inactive_params.values()),
+            )
+        active_params, inactive_params = self.optimizer_parameter_toggles[optimizer_idx]
+        for p in active_params:
+            p.requires_grad_(True)
+        for p in inactive_params:
+            p.requires_grad_(False)
+        self.active_optimizer_idx = optimizer_idx
+
     def reset_optimizers(self):
+        # the new optimizers might not hold the same parameters, so the requires_grad flags are set again
+        self.active_optimizer_idx = None
+        self.optimizer_parameter_toggles = {}
         self._optimizers = self.configure_optimizers()
         self._schedulers = None
         if isinstance(self._optimizers, tuple):
@@ -134,7 +134,8 @@ def visualize_exploration(
                 linewidth=0,
                 alpha=0.5,
             )
-            plt.colorbar(label=colorbar_label)
+            if birkhoff_vertices_cost is not None:
+                plt.colorbar(label=colorbar_label)
 
         # Plot the model parameters using the permutation without noise
         if permutation_without_noise is not None:
@@ -1,6 +1,7 @@
 import torch
 import typing as th
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import numpy as np
 
 
@@ -20,10 +21,21 @@ def qqplot(
     a: torch.Tensor, b: torch.Tensor, reject_outliers_factor: float, a_name: str, b_name: str, image_size: th.Tuple
 ):
     res = []
+    # move both of the sample sets to the cpu once, instead of once per column
+    a = a.detach().cpu().numpy() if isinstance(a, torch.Tensor) else np.asarray(a)
+    b = b.detach().cpu().numpy() if isinstance(b, torch.Tensor) else np.asarray(b)
+
+    # a single (non-pyplot) figure is drawn on an Agg canvas and reused for all the columns
+    fig = Figure()
+    canvas = FigureCanvas(fig)
+    ax = fig.add_subplot(111)
+    # customize the image size if needed
+    if image_size:
+        fig.set_size_inches(image_size[0], image_size[1])
 
     for i in range(a.shape[1]):
-        x_samples = a[:, i].detach().cpu().numpy().flatten()
-        y_samples = b[:, i].detach().cpu().numpy().flatten()
+        x_samples = a[:, i].flatten()
+        y_samples = b[:, i].flatten()
 
         # Put aside all the nan values
         potential_nan = np.isnan(x_samples) | np.isnan(y_samples)
@@ -40,40 +52,33 @@ def qqplot(
         x_samples = x_samples[~potential_nan]
         y_samples = y_samples[~potential_nan]
 
-        fig, ax = plt.subplots()
-        # customize the image size if needed
-        if image_size:
-            fig.set_size_inches(image_size[0], image_size[1])
-        try:
-            ax.set_title(f"{i+1}'th column")
-            ax.set_xlabel(a_name)
-            ax.set_ylabel(b_name)
-            mn = min(np.min(x_samples), np.min(y_samples))
-            mx = max(np.max(x_samples), np.max(y_samples))
-            ax.plot(np.linspace(mn, mx, 100), np.linspace(mn, mx, 100), c="red", alpha=0.2, label="y=x")
-            ax.text(0, 0, f"Outliers: {np.sum(potential_nan)}/{len(potential_nan)}", fontsize=10, color="red")
-            x_samples = np.sort(x_samples)
-            y_samples = np.sort(y_samples)
-
-            x_l, x_r = reject_outliers(x_samples, reject_outliers_factor)
-            y_l, y_r = reject_outliers(y_samples, reject_outliers_factor)
-
-            l = max(x_l, y_l)
-            r = min(x_r, y_r)
-            x_samples = x_samples[l:r]
-            y_samples = y_samples[l:r]
-
-            ax.scatter(x_samples, y_samples, s=1, alpha=0.2, label="samples")
-
-            ax.legend()
-
-            # draw everything to the figure for conversion
-            fig.canvas.draw()
-            # convert the figure to a numpy array
-            data = np.fromstring(fig.canvas.tostring_rgb(), dtype=np.uint8, sep="")
-            data = data.reshape(fig.canvas.get_width_height()[::-1] + (3,))
-        finally:
-            plt.close()
+        ax.clear()
+        ax.set_title(f"{i+1}'th column")
+        ax.set_xlabel(a_name)
+        ax.set_ylabel(b_name)
+        mn = min(np.min(x_samples), np.min(y_samples))
+        mx = max(np.max(x_samples), np.max(y_samples))
+        ax.plot(np.linspace(mn, mx, 100), np.linspace(mn, mx, 100), c="red", alpha=0.2, label="y=x")
+        ax.text(0, 0, f"Outliers: {np.sum(potential_nan)}/{len(potential_nan)}", fontsize=10, color="red")
+        x_samples = np.sort(x_samples)
+        y_samples = np.sort(y_samples)
+
+        x_l, x_r = reject_outliers(x_samples, reject_outliers_factor)
+        y_l, y_r = reject_outliers(y_samples, reject_outliers_factor)
+
+        l = max(x_l, y_l)
+        r = min(x_r, y_r)
+        x_samples = x_samples[l:r]
+        y_samples = y_samples[l:r]
+
+        ax.scatter(x_samples, y_samples, s=1, alpha=0.2, label="samples")
+
+        ax.legend()
+
+        # draw everything to the figure for conversion
+        canvas.draw()
+        # convert the figure to a numpy array
+        data = np.asarray(canvas.buffer_rgba())[..., :3].copy()  # (H, W, 3)
 
         res.append(data)
 